@@ -1,14 +1,21 @@
 import os
 import csv
+from datetime import datetime
 from io import StringIO
 from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, session, make_response
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_migrate import Migrate
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, Course, ContactMessage, Student, Testimonial, Video, Exam
+from models import db, Course, ContactMessage, Student, Testimonial, Video, Exam, student_course
 from forms import CourseForm, ContactForm, LoginForm, StudentRegistrationForm, StudentLoginForm, TestimonialForm, VideoForm, ExamForm
 from config import Config
+import notifications
+import counters
+import template_cache
+import maintenance
+import routing
+from routing import read_only
 
 ALLOWED_EXT = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -19,7 +26,12 @@ app.config.from_object(Config)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 db.init_app(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True)
+notifications.init_app(app)
+counters.init_app(app)
+template_cache.init_app(app)
+maintenance.init_app(app)
+routing.init_app(app)
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'student_login'
@@ -34,7 +46,8 @@ with app.app_context():
     db.create_all()
     
     # Add sample data if database is empty
-    if Course.query.count() == 0:
+    # Count ids only so this still works on a database that predates new columns
+    if db.session.query(db.func.count(Course.id)).scalar() == 0:
         sample_courses = [
             Course(
                 title="أساسيات الرياضيات",
@@ -121,7 +134,9 @@ def admin_clear_courses():
     if not is_logged_in():
         return redirect(url_for('admin_login'))
     try:
+        db.session.execute(student_course.delete())
         num_rows_deleted = db.session.query(Course).delete()
+        counters.recount()
         db.session.commit()
         flash(f'Successfully deleted {num_rows_deleted} courses.', 'success')
     except Exception as e:
@@ -256,7 +271,9 @@ def admin_delete_all_users():
     if not is_logged_in():
         return redirect(url_for('admin_login'))
     try:
+        db.session.execute(student_course.delete())
         num_deleted = Student.query.delete()
+        counters.recount()
         db.session.commit()
         flash(f'تم حذف {num_deleted} مستخدم بنجاح', 'success')
     except Exception as e:
@@ -326,6 +343,7 @@ def admin_course_videos(course_id):
             course_id=course.id
         )
         db.session.add(video)
+        notifications.queue_video_notification(video)
         db.session.commit()
         flash('تم إضافة الفيديو بنجاح', 'success')
         return redirect(url_for('admin_course_videos', course_id=course.id))
@@ -371,9 +389,11 @@ def admin_course_exams(course_id):
                 course_id=course.id
             )
             db.session.add(exam)
+            notifications.queue_exam_notifications(exam)
             db.session.commit()
             flash('تم إضافة الامتحان بنجاح', 'success')
         except Exception as e:
+            db.session.rollback()
             flash(f'حدث خطأ: {e}', 'danger')
         
         return redirect(url_for('admin_course_exams', course_id=course.id))
@@ -460,6 +480,7 @@ def admin_delete_course(id):
 
 # Admin: manage students
 @app.route('/admin/students')
+@read_only
 def admin_students():
     if not is_logged_in():
         return redirect(url_for('admin_login'))
@@ -496,6 +517,7 @@ def admin_delete_student(id):
     return redirect(url_for('admin_students'))
 
 @app.route('/admin/students/export')
+@read_only
 def admin_export_students():
     if not is_logged_in():
         return redirect(url_for('admin_login'))
@@ -534,6 +556,7 @@ def admin_messages():
     return render_template('admin_messages.html', messages=messages)
 
 @app.route('/admin/stats')
+@read_only
 def admin_stats():
     if not is_logged_in():
         return redirect(url_for('admin_login'))
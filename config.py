@@ -8,4 +8,53 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = str(BASE_DIR / 'static' / 'uploads')
     ADMIN_USER = os.environ.get('ADMIN_USER', 'admin')
-    ADMIN_PASS = os.environ.get('ADMIN_PASS', 'password')
\ No newline at end of file
+    ADMIN_PASS = os.environ.get('ADMIN_PASS', 'password')
+
+    # Outgoing mail for course notifications (see notifications.py).
+    # For local testing run an SMTP sink, e.g. `python -m aiosmtpd -n -l localhost:1025`.
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 1025))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '0') == '1'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+    SITE_URL = os.environ.get('SITE_URL', 'http://localhost:5000')
+    SITE_TIMEZONE = os.environ.get('SITE_TIMEZONE', 'Africa/Cairo')  # timezone of Exam.scheduled_date
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', 200))
+    NOTIFY_RATE_LIMIT = float(os.environ.get('NOTIFY_RATE_LIMIT', 10))  # messages per second
+    NOTIFY_SEND_RETRIES = int(os.environ.get('NOTIFY_SEND_RETRIES', 3))
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 5))
+    NOTIFY_REMINDER_HOURS = int(os.environ.get('NOTIFY_REMINDER_HOURS', 24))
+    NOTIFY_POLL_SECONDS = int(os.environ.get('NOTIFY_POLL_SECONDS', 30))
+    # Must outlast the worst case for one message (retries x 30 s timeout + backoff)
+    NOTIFY_LEASE_SECONDS = int(os.environ.get('NOTIFY_LEASE_SECONDS', 300))
+
+    # Compiled template cache shared by all workers (see template_cache.py)
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', str(BASE_DIR / 'instance' / 'jinja_cache'))
+    TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', '1') == '1'
+    TEMPLATE_PROFILING = os.environ.get('TEMPLATE_PROFILING', '0') == '1'
+
+    # Backups, housekeeping and archival (see maintenance.py)
+    BACKUP_DIR = os.environ.get('BACKUP_DIR', str(BASE_DIR / 'instance' / 'backups'))
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+    BACKUP_INTERVAL_HOURS = int(os.environ.get('BACKUP_INTERVAL_HOURS', 24))
+    MAINTENANCE_STEP_SLEEP = float(os.environ.get('MAINTENANCE_STEP_SLEEP', 0.05))  # seconds between steps
+    MAINTENANCE_WINDOW = os.environ.get('MAINTENANCE_WINDOW', '02:00-05:00')  # local time
+    VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', 500))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', str(BASE_DIR / 'instance' / 'archive'))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    # Table name -> age in days after which rows are archived (tables need id and created_at)
+    ARCHIVE_POLICIES = {
+        'contact_message': int(os.environ.get('ARCHIVE_CONTACT_MESSAGE_DAYS', 365)),
+    }
+
+    # Read-only views use a replica or a SQLite snapshot (see routing.py)
+    READ_REPLICA_URI = os.environ.get('READ_REPLICA_URI')
+    READ_REPLICA_PIN_SECONDS = int(os.environ.get('READ_REPLICA_PIN_SECONDS', 30))
+    # SQL returning the replica's lag in seconds, run on the replica, e.g. for PostgreSQL
+    # "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    READ_REPLICA_LAG_QUERY = os.environ.get('READ_REPLICA_LAG_QUERY')
+    READ_REPLICA_LAG_CHECK_SECONDS = int(os.environ.get('READ_REPLICA_LAG_CHECK_SECONDS', 5))
+    READ_SNAPSHOT_PATH = os.environ.get('READ_SNAPSHOT_PATH', str(BASE_DIR / 'instance' / 'read_snapshot.db'))
+    READ_SNAPSHOT_REFRESH = int(os.environ.get('READ_SNAPSHOT_REFRESH', 60))  # seconds
+    READ_MAX_STALENESS = int(os.environ.get('READ_MAX_STALENESS', 300))  # seconds
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""Denormalized counters on Course and Student.
+
+Course.student_count, Course.video_count, Course.exam_count and
+Student.course_count are adjusted with `UPDATE ... SET n = n + delta` inside the
+same flush that adds, removes or moves student_course, Video or Exam rows, so
+they commit or roll back together with the change itself.
+
+Bulk `Query.delete()` calls bypass the ORM and therefore these hooks; call
+recount() in the same transaction after them. `flask counters check` reports
+drift and `flask counters repair` recomputes everything from the source tables.
+"""
+from collections import Counter
+
+import click
+from sqlalchemy import event, func, inspect, select, update
+
+from models import db, Course, Student, Video, Exam, student_course
+
+
+def _course_count_columns():
+    return {
+        'student_count': (select(func.count())
+                          .select_from(student_course)
+                          .where(student_course.c.course_id == Course.id)
+                          .scalar_subquery()),
+        'video_count': (select(func.count(Video.id))
+                        .where(Video.course_id == Course.id)
+                        .scalar_subquery()),
+        'exam_count': (select(func.count(Exam.id))
+                       .where(Exam.course_id == Course.id)
+                       .scalar_subquery()),
+    }
+
+
+def _student_count_columns():
+    return {
+        'course_count': (select(func.count())
+                         .select_from(student_course)
+                         .where(student_course.c.student_id == Student.id)
+                         .scalar_subquery()),
+    }
+
+
+def recount():
+    """Recompute every counter from the source tables. Does not commit."""
+    db.session.execute(update(Course).values(**_course_count_columns()))
+    db.session.execute(update(Student).values(**_student_count_columns()))
+
+
+def check():
+    """Return a list of (model, id, column, stored, actual) for counters that drifted."""
+    drift = []
+    for model, columns in ((Course, _course_count_columns()), (Student, _student_count_columns())):
+        for name, actual in columns.items():
+            stored = getattr(model, name)
+            rows = db.session.execute(
+                select(model.id, stored, actual.label('actual')).where(stored != actual)
+            )
+            drift.extend((model.__name__, row[0], name, row[1], row.actual) for row in rows)
+    return drift
+
+
+class _CourseRef:
+    """Resolves the course id of a Video/Exam after the flush has assigned it."""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    @property
+    def course_id(self):
+        if self.obj.course_id is None and self.obj.course is not None:
+            return self.obj.course.id
+        return self.obj.course_id
+
+
+def _counter_for(obj):
+    return 'video_count' if isinstance(obj, Video) else 'exam_count'
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_counter_deltas(session, flush_context, instances):
+    # Keys are Course objects, _CourseRef or plain course ids; objects are needed
+    # because new rows have no id until the flush runs
+    courses = {'student_count': Counter(), 'video_count': Counter(), 'exam_count': Counter()}
+    students = Counter()
+
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Student):
+                history = inspect(obj).attrs.courses.history
+                for course in history.added:
+                    courses['student_count'][course] += 1
+                    students[obj] += 1
+                for course in history.deleted:
+                    courses['student_count'][course] -= 1
+                    students[obj] -= 1
+            elif isinstance(obj, (Video, Exam)) and obj in session.new:
+                courses[_counter_for(obj)][_CourseRef(obj)] += 1
+            elif isinstance(obj, (Video, Exam)):
+                # Moved to another course, via either course_id or .course
+                state = inspect(obj)
+                if state.attrs.course_id.history.has_changes() or state.attrs.course.history.has_changes():
+                    # The attribute history lacks the old value if it was expired, so
+                    # read it from the database, which still holds it before the flush
+                    model = type(obj)
+                    old_course_id = session.execute(select(model.course_id).where(model.id == obj.id)).scalar()
+                    courses[_counter_for(obj)][old_course_id] -= 1
+                    courses[_counter_for(obj)][_CourseRef(obj)] += 1
+
+        for obj in session.deleted:
+            if isinstance(obj, Student):
+                for course in obj.courses:
+                    courses['student_count'][course] -= 1
+            elif isinstance(obj, Course):
+                for student in obj.students:
+                    students[student] -= 1
+            elif isinstance(obj, (Video, Exam)):
+                courses[_counter_for(obj)][_CourseRef(obj)] -= 1
+
+    session.info['counter_deltas'] = (courses, students)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_counter_deltas(session, flush_context):
+    courses, students = session.info.pop('counter_deltas', ({}, Counter()))
+    connection = session.connection()
+    for column, deltas in courses.items():
+        for key, delta in deltas.items():
+            if isinstance(key, _CourseRef):
+                course_id = key.course_id
+            elif isinstance(key, Course):
+                course_id = key.id
+            else:
+                course_id = key
+            if delta and course_id is not None:
+                connection.execute(
+                    update(Course.__table__)
+                    .where(Course.__table__.c.id == course_id)
+                    .values({column: Course.__table__.c[column] + delta})
+                )
+    for student, delta in students.items():
+        if delta and student.id is not None:
+            connection.execute(
+                update(Student.__table__)
+                .where(Student.__table__.c.id == student.id)
+                .values(course_count=Student.__table__.c.course_count + delta)
+            )
+
+    session.info['counter_stale'] = [key for deltas in courses.values() for key in deltas
+                                     if isinstance(key, Course)] + list(students)
+
+
+@event.listens_for(db.session, 'after_flush_postexec')
+def _expire_stale_counters(session, flush_context):
+    # The in-memory values are stale after the UPDATEs; reload them on next access
+    for obj in session.info.pop('counter_stale', []):
+        if obj in session and obj not in session.deleted:
+            session.expire(obj, ['course_count'] if isinstance(obj, Student) else
+                           ['student_count', 'video_count', 'exam_count'])
+
+
+def init_app(app):
+    @app.cli.group('counters')
+    def counters_cli():
+        """Denormalized course/student counters."""
+
+    @counters_cli.command('check')
+    def counters_check():
+        """Report counters that do not match the source tables."""
+        drift = check()
+        for model, row_id, column, stored, actual in drift:
+            click.echo(f'{model} {row_id} {column}: stored {stored}, actual {actual}')
+        click.echo(f'{len(drift)} counters out of sync')
+        if drift:
+            raise SystemExit(1)
+
+    @counters_cli.command('repair')
+    def counters_repair():
+        """Recompute all counters from the source tables."""
+        drift = check()
+        recount()
+        db.session.commit()
+        click.echo(f'Repaired {len(drift)} counters')
@@ -0,0 +1,249 @@
+"""Backups, housekeeping and archival for the SQLite database.
+
+    flask maintenance backup          # online snapshot into BACKUP_DIR
+    flask maintenance optimize        # PRAGMA optimize + incremental vacuum
+    flask maintenance archive         # move aged rows to ARCHIVE_DIR
+    flask maintenance archive-query   # search archived rows
+    flask maintenance run             # scheduler for all of the above
+
+Nothing blocks live requests for long: snapshots are copied in one read
+transaction, which WAL mode lets run alongside writers, the vacuum frees
+VACUUM_STEP_PAGES pages at a time and archival moves ARCHIVE_BATCH_SIZE rows
+per transaction.
+
+Archived rows are appended to gzip-compressed JSON lines, one file per table
+and month (e.g. archive/contact_message/2025-09.jsonl.gz), and can be searched
+with iter_archived() or `flask maintenance archive-query`.
+"""
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import event
+
+from models import db
+
+
+def _database_path():
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise click.ClickException('Maintenance tasks only support a file-based SQLite database')
+    return url.database
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers and the backup run alongside writers
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
+
+
+def backup(app):
+    """Take an online snapshot of the database. Returns the backup file path."""
+    config = app.config
+    os.makedirs(config['BACKUP_DIR'], exist_ok=True)
+    target = os.path.join(config['BACKUP_DIR'], f"data-{datetime.utcnow():%Y%m%d-%H%M%S}.db")
+    partial = target + '.partial'
+
+    source = sqlite3.connect(_database_path(), timeout=30)
+    dest = sqlite3.connect(partial)
+    try:
+        # One step, so the copy is a single consistent read. A stepwise copy starts
+        # over whenever another connection writes and may never finish on a busy site
+        source.backup(dest, pages=-1)
+    finally:
+        dest.close()
+        source.close()
+    os.replace(partial, target)
+
+    backups = sorted(glob.glob(os.path.join(config['BACKUP_DIR'], 'data-*.db')))
+    for old in backups[:-config['BACKUP_KEEP']]:
+        os.remove(old)
+    return target
+
+
+def optimize(app):
+    """Refresh planner statistics and release free pages. Returns the number of pages freed."""
+    config = app.config
+    conn = sqlite3.connect(_database_path(), timeout=30, isolation_level=None)
+    try:
+        conn.execute('PRAGMA optimize')
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # Incremental vacuum needs auto_vacuum=INCREMENTAL, which only takes
+            # effect after one full VACUUM (see `flask maintenance optimize --full`)
+            return 0
+        freed = 0
+        while True:
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free_pages:
+                break
+            step = min(free_pages, config['VACUUM_STEP_PAGES'])
+            conn.execute(f'PRAGMA incremental_vacuum({step})').fetchall()
+            freed += step
+            time.sleep(config['MAINTENANCE_STEP_SLEEP'])
+        return freed
+    finally:
+        conn.close()
+
+
+def full_vacuum(app):
+    """Switch to incremental auto-vacuum and rebuild the file. Blocks writers while it runs."""
+    conn = sqlite3.connect(_database_path(), timeout=30, isolation_level=None)
+    try:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def _archive_path(app, table, day):
+    return os.path.join(app.config['ARCHIVE_DIR'], table, f'{day:%Y-%m}.jsonl.gz')
+
+
+def _serialize(row):
+    return {key: value.isoformat() if isinstance(value, (datetime, date)) else value
+            for key, value in row.items()}
+
+
+def archive(app):
+    """Move rows older than their ARCHIVE_POLICIES age to cold storage. Returns {table: rows}."""
+    config = app.config
+    moved = {}
+    for table_name, days in config['ARCHIVE_POLICIES'].items():
+        table = db.metadata.tables[table_name]
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        moved[table_name] = 0
+        while True:
+            rows = db.session.execute(
+                table.select()
+                .where(table.c.created_at < cutoff)
+                .order_by(table.c.id)
+                .limit(config['ARCHIVE_BATCH_SIZE'])
+            ).mappings().all()
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(_archive_path(app, table_name, row['created_at']), []).append(row)
+            for path, month_rows in by_month.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Each append adds a new gzip member; readers see them as one stream
+                with gzip.open(path, 'at', encoding='utf-8') as f:
+                    for row in month_rows:
+                        f.write(json.dumps(_serialize(row), ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # Rows are written before they are deleted; a crash in between can only
+            # duplicate them, and iter_archived() skips duplicates
+            db.session.execute(table.delete().where(table.c.id.in_([row['id'] for row in rows])))
+            db.session.commit()
+            moved[table_name] += len(rows)
+            time.sleep(config['MAINTENANCE_STEP_SLEEP'])
+    return moved
+
+
+def iter_archived(app, table, since=None, until=None, contains=None):
+    """Yield archived rows (as dicts) of `table`, optionally filtered by created_at and text."""
+    for path in sorted(glob.glob(os.path.join(app.config['ARCHIVE_DIR'], table, '*.jsonl.gz'))):
+        month = datetime.strptime(os.path.basename(path)[:7], '%Y-%m')
+        if since and month < datetime(since.year, since.month, 1):
+            continue
+        if until and month > until:
+            continue
+        # SQLite reuses ids once a table is emptied, so the id alone does not
+        # identify a row. A duplicate always lands in the same month file.
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                key = (row['id'], row['created_at'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                created_at = datetime.fromisoformat(row['created_at'])
+                if since and created_at < since or until and created_at >= until:
+                    continue
+                if contains and contains not in line:
+                    continue
+                yield row
+
+
+def _in_window(window, now):
+    start, end = (datetime.strptime(part, '%H:%M').time() for part in window.split('-'))
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def init_app(app):
+    with app.app_context():
+        event.listen(db.engine, 'connect', _sqlite_pragmas)
+
+    @app.cli.group('maintenance')
+    def maintenance_cli():
+        """Backups, housekeeping and archival for data.db."""
+
+    @maintenance_cli.command('backup')
+    def maintenance_backup():
+        """Take an online snapshot of the database."""
+        click.echo(f'Backup written to {backup(app)}')
+
+    @maintenance_cli.command('optimize')
+    @click.option('--full', is_flag=True, help='Enable incremental vacuum and run a full VACUUM (blocks writers).')
+    def maintenance_optimize(full):
+        """Refresh planner statistics and release free pages."""
+        if full:
+            full_vacuum(app)
+            click.echo('Full VACUUM done, incremental vacuum enabled')
+        click.echo(f'Freed {optimize(app)} pages')
+
+    @maintenance_cli.command('archive')
+    def maintenance_archive():
+        """Move aged rows to compressed cold storage."""
+        for table, count in archive(app).items():
+            click.echo(f'{table}: archived {count} rows')
+
+    @maintenance_cli.command('archive-query')
+    @click.argument('table')
+    @click.option('--since', type=click.DateTime(), help='Only rows created on or after this date.')
+    @click.option('--until', type=click.DateTime(), help='Only rows created before this date.')
+    @click.option('--contains', help='Only rows containing this text.')
+    def maintenance_archive_query(table, since, until, contains):
+        """Print archived rows of TABLE as JSON lines."""
+        for row in iter_archived(app, table, since, until, contains):
+            click.echo(json.dumps(row, ensure_ascii=False))
+
+    @maintenance_cli.command('run')
+    def maintenance_run():
+        """Run backups every BACKUP_INTERVAL_HOURS and housekeeping once per MAINTENANCE_WINDOW."""
+        config = app.config
+        last_backup = None
+        last_housekeeping = None
+        click.echo('Maintenance scheduler started')
+        while True:
+            now = datetime.now()
+            if last_backup is None or now - last_backup >= timedelta(hours=config['BACKUP_INTERVAL_HOURS']):
+                try:
+                    app.logger.info('Backup written to %s', backup(app))
+                except Exception as e:
+                    app.logger.warning('Backup failed: %s', e)
+                last_backup = now
+            if _in_window(config['MAINTENANCE_WINDOW'], now) and last_housekeeping != now.date():
+                try:
+                    app.logger.info('Archived %s', archive(app))
+                    app.logger.info('Freed %d pages', optimize(app))
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning('Housekeeping failed: %s', e)
+                last_housekeeping = now.date()
+            time.sleep(60)
@@ -0,0 +1,82 @@
+"""read-path indexes and denormalized counters
+
+Revision ID: 3c1d9a7b52e4
+Revises: a7e2c4d9b1f0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d9a7b52e4'
+down_revision = 'a7e2c4d9b1f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('student_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('video_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('exam_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_course_featured_created_at', ['featured', 'created_at'], unique=False)
+        batch_op.create_index('ix_course_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('course_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('student_course', schema=None) as batch_op:
+        batch_op.create_index('ix_student_course_course_id_student_id', ['course_id', 'student_id'], unique=False)
+
+    with op.batch_alter_table('contact_message', schema=None) as batch_op:
+        batch_op.create_index('ix_contact_message_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('testimonial', schema=None) as batch_op:
+        batch_op.create_index('ix_testimonial_course_id', ['course_id'], unique=False)
+
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.create_index('ix_video_course_id_created_at', ['course_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.create_index('ix_exam_course_id_created_at', ['course_id', 'created_at'], unique=False)
+
+    # Backfill the counters from the existing rows
+    op.execute(
+        'UPDATE course SET '
+        'student_count = (SELECT COUNT(*) FROM student_course WHERE student_course.course_id = course.id), '
+        'video_count = (SELECT COUNT(*) FROM video WHERE video.course_id = course.id), '
+        'exam_count = (SELECT COUNT(*) FROM exam WHERE exam.course_id = course.id)'
+    )
+    op.execute(
+        'UPDATE student SET '
+        'course_count = (SELECT COUNT(*) FROM student_course WHERE student_course.student_id = student.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.drop_index('ix_exam_course_id_created_at')
+
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.drop_index('ix_video_course_id_created_at')
+
+    with op.batch_alter_table('testimonial', schema=None) as batch_op:
+        batch_op.drop_index('ix_testimonial_course_id')
+
+    with op.batch_alter_table('contact_message', schema=None) as batch_op:
+        batch_op.drop_index('ix_contact_message_created_at')
+
+    with op.batch_alter_table('student_course', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_course_course_id_student_id')
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_column('course_count')
+
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_index('ix_course_created_at')
+        batch_op.drop_index('ix_course_featured_created_at')
+        batch_op.drop_column('exam_count')
+        batch_op.drop_column('video_count')
+        batch_op.drop_column('student_count')
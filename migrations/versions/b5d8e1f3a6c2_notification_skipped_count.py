@@ -0,0 +1,30 @@
+"""notification skipped_count
+
+Revision ID: b5d8e1f3a6c2
+Revises: 3c1d9a7b52e4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d8e1f3a6c2'
+down_revision = '3c1d9a7b52e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # app.py runs db.create_all() on import, so a7e2c4d9b1f0 may have found the
+    # table already created from the current model, including this column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('notification')}
+    if 'skipped_count' not in columns:
+        with op.batch_alter_table('notification', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('skipped_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_column('skipped_count')
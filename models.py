@@ -1,13 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
+from routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Association table for many-to-many relationship between students and courses
 student_course = db.Table('student_course',
     db.Column('student_id', db.Integer, db.ForeignKey('student.id'), primary_key=True),
-    db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True),
+    # The primary key covers lookups by student; this one covers lookups by course
+    db.Index('ix_student_course_course_id_student_id', 'course_id', 'student_id')
 )
 
 class Course(db.Model):
@@ -20,6 +23,15 @@ class Course(db.Model):
     image = db.Column(db.String(300))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     featured = db.Column(db.Boolean, default=False)
+    # Denormalized counters, kept up to date by counters.py
+    student_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    video_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    exam_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_course_featured_created_at', 'featured', 'created_at'),
+        db.Index('ix_course_created_at', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Course {self.title}>'
@@ -36,6 +48,7 @@ class Student(db.Model, UserMixin):
     active = db.Column(db.Boolean, default=True)
     profile_picture = db.Column(db.String(300))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    course_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # see counters.py
 
     def get_avatar(self):
         from flask import url_for
@@ -56,6 +69,10 @@ class ContactMessage(db.Model):
     message = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_contact_message_created_at', 'created_at'),
+    )
+
 class Testimonial(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_name = db.Column(db.String(120), nullable=False)
@@ -66,6 +83,10 @@ class Testimonial(db.Model):
     
     course = db.relationship('Course', backref=db.backref('testimonials', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_testimonial_course_id', 'course_id'),
+    )
+
     def __repr__(self):
         return f'<Testimonial {self.student_name}>'
 
@@ -79,6 +100,10 @@ class Video(db.Model):
     
     course = db.relationship('Course', backref=db.backref('videos', lazy='dynamic', cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        db.Index('ix_video_course_id_created_at', 'course_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Video {self.title}>'
 
@@ -94,6 +119,10 @@ class Exam(db.Model):
     
     course = db.relationship('Course', backref=db.backref('exams', lazy='dynamic', cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        db.Index('ix_exam_course_id_created_at', 'course_id', 'created_at'),
+    )
+
     def get_questions(self):
         try:
             return json.loads(self.questions)
@@ -101,4 +130,31 @@ class Exam(db.Model):
             return []
 
     def __repr__(self):
-        return f'<Exam {self.title}>'
\ No newline at end of file
+        return f'<Exam {self.title}>'
+
+
+class Notification(db.Model):
+    """Outbox row for e-mails to the students enrolled in a course.
+
+    Rows are added in the same transaction as the Video/Exam they announce and
+    are delivered later by the dispatcher in notifications.py.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # new_video, new_exam, exam_reminder
+    course_id = db.Column(db.Integer, nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)  # Video.id or Exam.id
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, done, failed
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_student_id = db.Column(db.Integer, default=0, nullable=False)  # fan-out cursor
+    sent_count = db.Column(db.Integer, default=0, nullable=False)
+    skipped_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # permanently refused addresses
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_notification_status_available_at', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f'<Notification {self.kind} {self.object_id}>'
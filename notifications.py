@@ -0,0 +1,311 @@
+"""E-mail notifications for new lectures and scheduled exams.
+
+Views only write Notification rows (the outbox) in the same transaction as the
+Video/Exam insert. A separate worker process delivers them:
+
+    flask notify run      # keep polling the outbox
+    flask notify once     # deliver everything that is due, then exit
+
+For local testing start an SMTP sink (MAIL_SERVER/MAIL_PORT default to
+localhost:1025), e.g. `python -m aiosmtpd -n -l localhost:1025`.
+"""
+import smtplib
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from zoneinfo import ZoneInfo
+
+import click
+from flask import current_app
+
+from models import db, Course, Student, Video, Exam, Notification, student_course
+
+
+def _site_now():
+    """Current wall-clock time in SITE_TIMEZONE, naive like Exam.scheduled_date."""
+    return datetime.now(ZoneInfo(current_app.config['SITE_TIMEZONE'])).replace(tzinfo=None)
+
+
+def _site_to_utc(value):
+    """Convert a naive SITE_TIMEZONE time to naive UTC, as stored in Notification.available_at."""
+    site_tz = ZoneInfo(current_app.config['SITE_TIMEZONE'])
+    return value.replace(tzinfo=site_tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def queue_video_notification(video):
+    """Add the outbox row for a new video. Call before the session commit."""
+    db.session.flush()
+    db.session.add(Notification(kind='new_video', course_id=video.course_id, object_id=video.id))
+
+
+def queue_exam_notifications(exam):
+    """Add the outbox rows for a new exam and its reminder. Call before the session commit."""
+    db.session.flush()
+    db.session.add(Notification(kind='new_exam', course_id=exam.course_id, object_id=exam.id))
+    if exam.scheduled_date is None:
+        return
+    # scheduled_date is entered and shown as local site time. An exam scheduled
+    # inside the reminder window gets no reminder: the new_exam mail covers it
+    remind_at = _site_to_utc(exam.scheduled_date - timedelta(hours=current_app.config['NOTIFY_REMINDER_HOURS']))
+    if remind_at > datetime.utcnow():
+        db.session.add(Notification(
+            kind='exam_reminder',
+            course_id=exam.course_id,
+            object_id=exam.id,
+            available_at=remind_at
+        ))
+
+
+class RateLimiter:
+    """Simple token bucket: allows `rate` calls per second on average."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+
+class SMTPPool:
+    """Keeps one SMTP connection open across messages and reconnects on failure."""
+
+    def __init__(self, config):
+        self.config = config
+        self.conn = None
+        self.limiter = RateLimiter(config['NOTIFY_RATE_LIMIT'])
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.config['MAIL_SERVER'], self.config['MAIL_PORT'], timeout=30)
+        if self.config['MAIL_USE_TLS']:
+            conn.starttls()
+        if self.config['MAIL_USERNAME']:
+            conn.login(self.config['MAIL_USERNAME'], self.config['MAIL_PASSWORD'])
+        return conn
+
+    def send(self, message):
+        """Send one message. Returns False if the server permanently refused it."""
+        retries = self.config['NOTIFY_SEND_RETRIES']
+        for attempt in range(retries + 1):
+            self.limiter.wait()
+            try:
+                if self.conn is None:
+                    self.conn = self._connect()
+                self.conn.send_message(message)
+                return True
+            except smtplib.SMTPRecipientsRefused as e:
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    # Bad address: retrying will not help, skip this student
+                    current_app.logger.warning('Skipping %s: %s', message['To'], e.recipients)
+                    return False
+                self.close()
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+            except smtplib.SMTPDataError as e:
+                if e.smtp_code >= 500:
+                    # This one message was refused after DATA; skip this student
+                    current_app.logger.warning('Skipping %s: %s %s', message['To'], e.smtp_code, e.smtp_error)
+                    return False
+                self.close()
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+            except smtplib.SMTPSenderRefused as e:
+                # MAIL FROM refused (bad sender, auth required, quota): this affects
+                # every message, so fail the notification and let it be retried
+                self.close()
+                if e.smtp_code >= 500 or attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+            except (smtplib.SMTPException, OSError):
+                self.close()
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.conn = None
+
+
+def _build_content(notification):
+    """Return (subject, body) for a notification, or None if its target is gone."""
+    course = Course.query.get(notification.course_id)
+    if course is None:
+        return None
+    link = f"{current_app.config['SITE_URL'].rstrip('/')}/course/{course.slug}"
+
+    if notification.kind == 'new_video':
+        video = Video.query.get(notification.object_id)
+        if video is None:
+            return None
+        return (f'محاضرة جديدة: {video.title}',
+                f'تمت إضافة محاضرة جديدة "{video.title}" إلى دورة {course.title}.\n{link}')
+
+    exam = Exam.query.get(notification.object_id)
+    if exam is None:
+        return None
+    when = exam.scheduled_date.strftime('%Y-%m-%d %H:%M') if exam.scheduled_date else None
+    if notification.kind == 'new_exam':
+        body = f'تمت إضافة امتحان جديد "{exam.title}" إلى دورة {course.title}.'
+        if when:
+            body += f'\nموعد الامتحان: {when}'
+        return f'امتحان جديد: {exam.title}', f'{body}\n{link}'
+
+    # exam_reminder: skip if the exam was unscheduled or has already started
+    if exam.scheduled_date is None or exam.scheduled_date <= _site_now():
+        return None
+    return (f'تذكير بموعد امتحان: {exam.title}',
+            f'نذكرك بامتحان "{exam.title}" في دورة {course.title}.\nموعد الامتحان: {when}\n{link}')
+
+
+def _recipient_batches(notification, batch_size):
+    """Yield lists of (id, email, name) rows for active students enrolled in the course,
+    resuming after the stored cursor. Plain rows are not expired by the per-message commits."""
+    while True:
+        batch = (db.session.query(Student.id, Student.email, Student.name)
+                 .join(student_course, student_course.c.student_id == Student.id)
+                 .filter(student_course.c.course_id == notification.course_id,
+                         Student.active == True,
+                         Student.id > notification.last_student_id)
+                 .order_by(Student.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            return
+        yield batch
+
+
+def _claim(notification_id, lease_seconds):
+    """Mark a due row as ours for `lease_seconds`. Returns False if another worker got it."""
+    now = datetime.utcnow()
+    claimed = (Notification.query
+               .filter(Notification.id == notification_id,
+                       Notification.status.in_(('pending', 'processing')),
+                       Notification.available_at <= now)
+               .update({'status': 'processing',
+                        'available_at': now + timedelta(seconds=lease_seconds)},
+                       synchronize_session=False))
+    db.session.commit()
+    return claimed == 1
+
+
+def deliver(notification, pool):
+    config = current_app.config
+    content = _build_content(notification)
+    if content is None:
+        notification.status = 'done'
+        db.session.commit()
+        return
+    subject, body = content
+
+    # Nothing else writes this row while we hold the lease, so keep it loaded
+    # across the per-message commits instead of reloading it every time
+    db_session = db.session()
+    expire_on_commit, db_session.expire_on_commit = db_session.expire_on_commit, False
+    try:
+        for batch in _recipient_batches(notification, config['NOTIFY_BATCH_SIZE']):
+            for student in batch:
+                _send_to(notification, student, subject, body, pool)
+    finally:
+        db_session.expire_on_commit = expire_on_commit
+
+    notification.status = 'done'
+    notification.last_error = None
+    db.session.commit()
+
+
+def _send_to(notification, student, subject, body, pool):
+    config = current_app.config
+    message = EmailMessage()
+    message['From'] = config['MAIL_DEFAULT_SENDER']
+    message['To'] = student.email
+    message['Subject'] = subject
+    message.set_content(f'مرحباً {student.name}،\n\n{body}')
+    sent = pool.send(message)
+    # Persist progress and renew the lease after every message, so a
+    # failure never re-sends mail that already went out and another
+    # worker cannot re-claim the row while we are still sending
+    notification.last_student_id = student.id
+    if sent:
+        notification.sent_count += 1
+    else:
+        notification.skipped_count += 1
+    notification.available_at = datetime.utcnow() + timedelta(seconds=config['NOTIFY_LEASE_SECONDS'])
+    db.session.commit()
+
+
+def dispatch_pending(limit=50):
+    """Deliver due outbox rows. Returns the number of rows processed."""
+    config = current_app.config
+    due_ids = [row.id for row in (Notification.query
+                                  .with_entities(Notification.id)
+                                  .filter(Notification.status.in_(('pending', 'processing')),
+                                          Notification.available_at <= datetime.utcnow())
+                                  .order_by(Notification.available_at)
+                                  .limit(limit))]
+    pool = SMTPPool(config)
+    processed = 0
+    try:
+        for notification_id in due_ids:
+            if not _claim(notification_id, config['NOTIFY_LEASE_SECONDS']):
+                continue
+            notification = Notification.query.get(notification_id)
+            try:
+                deliver(notification, pool)
+            except Exception as e:
+                db.session.rollback()
+                notification = Notification.query.get(notification_id)
+                notification.attempts += 1
+                notification.last_error = str(e)
+                if notification.attempts >= config['NOTIFY_MAX_ATTEMPTS']:
+                    notification.status = 'failed'
+                else:
+                    notification.status = 'pending'
+                    notification.available_at = datetime.utcnow() + timedelta(minutes=2 ** notification.attempts)
+                db.session.commit()
+                current_app.logger.warning('Notification %s failed: %s', notification_id, e)
+            processed += 1
+    finally:
+        pool.close()
+    return processed
+
+
+def init_app(app):
+    @app.cli.group('notify')
+    def notify_cli():
+        """Course notification e-mails."""
+
+    @notify_cli.command('once')
+    def notify_once():
+        """Deliver all due notifications and exit."""
+        total = 0
+        while True:
+            processed = dispatch_pending()
+            total += processed
+            if not processed:
+                break
+        click.echo(f'Processed {total} notifications')
+
+    @notify_cli.command('run')
+    def notify_run():
+        """Keep polling the outbox and deliver due notifications."""
+        click.echo('Notification dispatcher started')
+        while True:
+            if not dispatch_pending():
+                time.sleep(app.config['NOTIFY_POLL_SECONDS'])
@@ -0,0 +1,206 @@
+"""Send read-only views to a replica so reports do not compete with live writes.
+
+Views decorated with @read_only run their queries against:
+
+- READ_REPLICA_URI, if set (e.g. a streaming replica of a server database). With
+  READ_REPLICA_LAG_QUERY set, the replica's lag is checked every
+  READ_REPLICA_LAG_CHECK_SECONDS and it is only used while the lag is known and
+  at most READ_MAX_STALENESS seconds; without it the lag is not bounded.
+- Otherwise a snapshot copy of the SQLite database at READ_SNAPSHOT_PATH. The
+  snapshot is refreshed in the background once it is older than
+  READ_SNAPSHOT_REFRESH seconds, and is only used while it is at most
+  READ_MAX_STALENESS seconds old.
+
+Everything else, and every flush, uses the primary database. After a request
+commits a write, the browser session is pinned to the primary until the
+replica has caught up (the snapshot was taken after the write, or
+READ_REPLICA_PIN_SECONDS have passed for a server replica), so users always see
+their own changes.
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+import click
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+
+_refresh_lock = threading.Lock()
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries may be served by the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Session that sends reads from @read_only views to the replica engine."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('read_only'):
+            engine = _replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _pin_to_primary(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context():
+        session['last_write_at'] = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(db_session):
+    db_session.info.pop('wrote', None)
+
+
+def _primary_path(app):
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        return None
+    return url.database
+
+
+def _engines(app):
+    return app.extensions.setdefault('routing', {})
+
+
+def _replica_engine():
+    app = current_app._get_current_object()
+    config = app.config
+    engines = _engines(app)
+    last_write_at = session.get('last_write_at', 0)
+
+    if config['READ_REPLICA_URI']:
+        if time.time() - last_write_at < config['READ_REPLICA_PIN_SECONDS']:
+            return None
+        if 'replica' not in engines:
+            engines['replica'] = create_engine(config['READ_REPLICA_URI'])
+        if config['READ_REPLICA_LAG_QUERY']:
+            lag = _replica_lag(app, engines['replica'])
+            if lag is None or lag > config['READ_MAX_STALENESS']:
+                return None
+        return engines['replica']
+
+    if _primary_path(app) is None:
+        return None
+    snapshot_at = snapshot_time(app)
+    if snapshot_at is None or time.time() - snapshot_at > config['READ_SNAPSHOT_REFRESH']:
+        _refresh_in_background(app)
+    if snapshot_at is None or time.time() - snapshot_at > config['READ_MAX_STALENESS']:
+        return None
+    if snapshot_at < last_write_at:
+        return None
+    if 'snapshot' not in engines:
+        # Read-only, and NullPool so every checkout reopens the file and sees a refreshed snapshot
+        engines['snapshot'] = create_engine(f"sqlite:///file:{config['READ_SNAPSHOT_PATH']}?mode=ro&uri=true",
+                                            poolclass=NullPool)
+    return engines['snapshot']
+
+
+def _replica_lag(app, engine):
+    """Return the replica lag in seconds, checked at most every READ_REPLICA_LAG_CHECK_SECONDS,
+    or None if it could not be determined."""
+    engines = _engines(app)
+    checked_at, lag = engines.get('replica_lag', (0, None))
+    if time.time() - checked_at >= app.config['READ_REPLICA_LAG_CHECK_SECONDS']:
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(text(app.config['READ_REPLICA_LAG_QUERY'])).scalar()
+            lag = None if lag is None else float(lag)
+        except SQLAlchemyError as e:
+            app.logger.warning('Replica lag check failed: %s', e)
+            lag = None
+        engines['replica_lag'] = (time.time(), lag)
+    return lag
+
+
+def snapshot_time(app):
+    """Return when the current snapshot was taken (epoch seconds), or None if there is none."""
+    try:
+        return os.path.getmtime(app.config['READ_SNAPSHOT_PATH'])
+    except OSError:
+        return None
+
+
+def refresh_snapshot(app):
+    """Copy the primary database to READ_SNAPSHOT_PATH using the online backup API."""
+    config = app.config
+    target = config['READ_SNAPSHOT_PATH']
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    lock_path = target + '.lock'
+    try:
+        # Only one process refreshes at a time; a lock older than 10 minutes is stale
+        if os.path.exists(lock_path) and time.time() - os.path.getmtime(lock_path) > 600:
+            os.remove(lock_path)
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+
+    try:
+        started = time.time()
+        partial = target + '.partial'
+        source = sqlite3.connect(_primary_path(app), timeout=30)
+        dest = sqlite3.connect(partial)
+        try:
+            # One step: a paged copy restarts whenever the primary is written to
+            source.backup(dest, pages=-1)
+            # Readers open the snapshot read-only, so it must not need a WAL file
+            dest.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dest.close()
+            source.close()
+        # Stamp the snapshot with the time the copy started: it holds at least every
+        # write committed before then
+        os.utime(partial, (started, started))
+        os.replace(partial, target)
+        return True
+    finally:
+        os.remove(lock_path)
+
+
+def _refresh_in_background(app):
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            refresh_snapshot(app)
+        except Exception as e:
+            app.logger.warning('Read snapshot refresh failed: %s', e)
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def init_app(app):
+    @app.cli.group('replica')
+    def replica_cli():
+        """Read replica / snapshot used by read-only views."""
+
+    @replica_cli.command('refresh')
+    def replica_refresh():
+        """Refresh the SQLite read snapshot now."""
+        if _primary_path(app) is None:
+            raise click.ClickException('Read snapshots need a file-based SQLite primary database')
+        if refresh_snapshot(app):
+            click.echo(f"Snapshot written to {app.config['READ_SNAPSHOT_PATH']}")
+        else:
+            click.echo('Another process is refreshing the snapshot')
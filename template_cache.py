@@ -0,0 +1,91 @@
+"""Compiled-template cache shared by all workers.
+
+Compiled templates are stored in TEMPLATE_CACHE_DIR with Jinja's
+FileSystemBytecodeCache. Entries are keyed on the template source checksum, so
+an edited template is simply recompiled. Run `flask templates precompile` at
+deploy time to fill the cache before any worker starts; with TEMPLATE_WARMUP
+each worker then loads every template from it at boot instead of on its first
+request.
+
+With TEMPLATE_PROFILING (or app.debug) every render_template() call is timed,
+logged and reported in the Server-Timing response header.
+"""
+import os
+import time
+
+import click
+from flask import g, before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+
+def load_all(app):
+    """Compile (or load from the bytecode cache) every template. Returns {name: seconds}."""
+    timings = {}
+    env = app.jinja_env
+    for name in env.list_templates(extensions=['html']):
+        start = time.perf_counter()
+        env.get_template(name)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def _profiling(app):
+    return app.config['TEMPLATE_PROFILING'] or app.debug
+
+
+def _start_timer(sender, template, context, **extra):
+    if not _profiling(sender):
+        return
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+
+def _stop_timer(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if not timers:
+        return
+    elapsed = (time.perf_counter() - timers.pop()) * 1000
+    g.setdefault('template_timings', []).append((template.name, elapsed))
+    sender.logger.debug('Rendered %s in %.1f ms', template.name, elapsed)
+
+
+def _add_server_timing(response):
+    timings = g.get('template_timings')
+    if timings:
+        entries = [f'tpl{i};desc="{name}";dur={elapsed:.1f}' for i, (name, elapsed) in enumerate(timings)]
+        response.headers.add('Server-Timing', ', '.join(entries))
+    return response
+
+
+def init_app(app):
+    # Must run before app.jinja_env is first accessed
+    cache_dir = app.config['TEMPLATE_CACHE_DIR']
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(cache_dir)}
+
+    # Checked per render so app.run(debug=True) also enables profiling
+    before_render_template.connect(_start_timer, app)
+    template_rendered.connect(_stop_timer, app)
+    app.after_request(_add_server_timing)
+
+    if app.config['TEMPLATE_WARMUP']:
+        try:
+            timings = load_all(app)
+        except TemplateError as e:
+            # A broken template should only break its own page, not worker boot
+            app.logger.warning('Template warm-up failed: %s', e)
+            timings = {}
+        app.logger.info('Loaded %d templates in %.1f ms', len(timings), sum(timings.values()) * 1000)
+
+    @app.cli.group('templates')
+    def templates_cli():
+        """Compiled template cache."""
+
+    @templates_cli.command('precompile')
+    def templates_precompile():
+        """Compile every template into the bytecode cache."""
+        app.jinja_env.bytecode_cache.clear()
+        app.jinja_env.cache.clear()
+        timings = load_all(app)
+        for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+            click.echo(f'{seconds * 1000:8.1f} ms  {name}')
+        click.echo(f'Compiled {len(timings)} templates into {cache_dir}')